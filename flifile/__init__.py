@@ -1,4 +1,4 @@
-from .flifile import FliFile
+from .flifile import FliFile, verifyall
 from .version import __version__
 
-__all__ = ["FliFile", "__version__"]
+__all__ = ["FliFile", "verifyall", "__version__"]
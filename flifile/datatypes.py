@@ -13,51 +13,60 @@ np_dtypes = np.uint8 | np.uint16 | np.uint32 | np.int8 | np.int16 | np.int32 | n
 
 
 class Datatypes(Enum):
-    UINT8 = (np.uint8, 8, Packing.UNKNOWN)
-    UINT16 = (np.uint16, 16, Packing.UNKNOWN)
-    UINT12 = (np.uint16, 12, Packing.UNKNOWN)
-    UINT32 = (np.uint32, 32, Packing.UNKNOWN)
-    INT8 = (np.int8, 8, Packing.UNKNOWN)
-    INT16 = (np.int16, 16, Packing.UNKNOWN)
-    INT32 = (np.int32, 32, Packing.UNKNOWN)
-    REAL32 = (np.float32, 32, Packing.UNKNOWN)
-    REAL64 = (np.float64, 64, Packing.UNKNOWN)
-    BayerBG16 = (np.uint16, 16, Packing.UNKNOWN)
-    BayerGB16 = (np.uint16, 16, Packing.UNKNOWN)
-    BayerRG10 = (np.uint16, 16, Packing.UNKNOWN)
-    BayerRG12 = (np.uint16, 16, Packing.UNKNOWN)
-    BayerRG16 = (np.uint16, 16, Packing.UNKNOWN)
-    Mono10 = (np.uint16, 16, Packing.UNKNOWN)
-    Mono12 = (np.uint16, 16, Packing.UNKNOWN)
-    Mono14 = (np.uint16, 16, Packing.UNKNOWN)
-    Mono16 = (np.uint16, 16, Packing.UNKNOWN)
-    Mono8 = (np.uint8, 8, Packing.UNKNOWN)
-    Mono10p = (np.uint16, 10, Packing.LSB)
-    Mono10pmsb = (np.uint16, 10, Packing.MSB)
-    BayerBG12 = (np.uint16, 16, Packing.UNKNOWN)
-    BayerBG12p = (np.uint16, 12, Packing.LSB)
-    BayerBG12pmsb = (np.uint16, 12, Packing.MSB)
-    BayerGB12 = (np.uint16, 16, Packing.UNKNOWN)
-    BayerGB12p = (np.uint16, 12, Packing.LSB)
-    BayerGB12pmsb = (np.uint16, 12, Packing.MSB)
-    BayerRG12p = (np.uint16, 12, Packing.LSB)
-    BayerRG12pmsb = (np.uint16, 12, Packing.MSB)
-    BayerRG12Packed = (np.uint16, 12, Packing.UNKNOWN)
-    Mono12p = (np.uint16, 12, Packing.LSB)
-    Mono12pmsb = (np.uint16, 12, Packing.MSB)
-    Mono12Packed = (np.uint16, 12, Packing.UNKNOWN)
-    Mono14p = (np.uint16, 14, Packing.LSB)
-    BayerBG8 = (np.uint8, 8, Packing.UNKNOWN)
-    BayerGB8 = (np.uint8, 8, Packing.UNKNOWN)
-    BGR8 = (np.uint8, 8, Packing.UNKNOWN)
-    BGR8Packed = (np.uint8, 8, Packing.UNKNOWN)
-    RGB8 = (np.uint8, 8, Packing.UNKNOWN)
-    RGB8Packed = (np.uint8, 8, Packing.UNKNOWN)
+    UINT8 = (np.uint8, 8, Packing.UNKNOWN, "")
+    UINT16 = (np.uint16, 16, Packing.UNKNOWN, "")
+    UINT12 = (np.uint16, 12, Packing.UNKNOWN, "")
+    UINT32 = (np.uint32, 32, Packing.UNKNOWN, "")
+    INT8 = (np.int8, 8, Packing.UNKNOWN, "")
+    INT16 = (np.int16, 16, Packing.UNKNOWN, "")
+    INT32 = (np.int32, 32, Packing.UNKNOWN, "")
+    REAL32 = (np.float32, 32, Packing.UNKNOWN, "")
+    REAL64 = (np.float64, 64, Packing.UNKNOWN, "")
+    BayerBG16 = (np.uint16, 16, Packing.UNKNOWN, "BayerBG16")
+    BayerGB16 = (np.uint16, 16, Packing.UNKNOWN, "BayerGB16")
+    BayerRG10 = (np.uint16, 16, Packing.UNKNOWN, "BayerRG10")
+    BayerRG12 = (np.uint16, 16, Packing.UNKNOWN, "BayerRG12")
+    BayerRG16 = (np.uint16, 16, Packing.UNKNOWN, "BayerRG16")
+    Mono10 = (np.uint16, 16, Packing.UNKNOWN, "")
+    Mono12 = (np.uint16, 16, Packing.UNKNOWN, "")
+    Mono14 = (np.uint16, 16, Packing.UNKNOWN, "")
+    Mono16 = (np.uint16, 16, Packing.UNKNOWN, "")
+    Mono8 = (np.uint8, 8, Packing.UNKNOWN, "")
+    Mono10p = (np.uint16, 10, Packing.LSB, "")
+    Mono10pmsb = (np.uint16, 10, Packing.MSB, "")
+    BayerBG12 = (np.uint16, 16, Packing.UNKNOWN, "BayerBG12")
+    BayerBG12p = (np.uint16, 12, Packing.LSB, "BayerBG12p")
+    BayerBG12pmsb = (np.uint16, 12, Packing.MSB, "BayerBG12pmsb")
+    BayerGB12 = (np.uint16, 16, Packing.UNKNOWN, "BayerGB12")
+    BayerGB12p = (np.uint16, 12, Packing.LSB, "BayerGB12p")
+    BayerGB12pmsb = (np.uint16, 12, Packing.MSB, "BayerGB12pmsb")
+    BayerRG12p = (np.uint16, 12, Packing.LSB, "BayerRG12p")
+    BayerRG12pmsb = (np.uint16, 12, Packing.MSB, "BayerRG12pmsb")
+    BayerRG12Packed = (np.uint16, 12, Packing.UNKNOWN, "BayerRG12Packed")
+    Mono12p = (np.uint16, 12, Packing.LSB, "")
+    Mono12pmsb = (np.uint16, 12, Packing.MSB, "")
+    Mono12Packed = (np.uint16, 12, Packing.UNKNOWN, "")
+    Mono14p = (np.uint16, 14, Packing.LSB, "")
+    BayerBG8 = (np.uint8, 8, Packing.UNKNOWN, "BayerBG8")
+    BayerGB8 = (np.uint8, 8, Packing.UNKNOWN, "BayerGB8")
+    BayerRG8 = (np.uint8, 8, Packing.UNKNOWN, "BayerRG8")
+    BayerGR8 = (np.uint8, 8, Packing.UNKNOWN, "BayerGR8")
+    BayerGR10 = (np.uint16, 16, Packing.UNKNOWN, "BayerGR10")
+    BayerGR12 = (np.uint16, 16, Packing.UNKNOWN, "BayerGR12")
+    BayerGR12p = (np.uint16, 12, Packing.LSB, "BayerGR12p")
+    BayerGR12pmsb = (np.uint16, 12, Packing.MSB, "BayerGR12pmsb")
+    BayerGR16 = (np.uint16, 16, Packing.UNKNOWN, "BayerGR16")
+    BGR8 = (np.uint8, 8, Packing.UNKNOWN, "")
+    BGR8Packed = (np.uint8, 8, Packing.UNKNOWN, "")
+    RGB8 = (np.uint8, 8, Packing.UNKNOWN, "")
+    RGB8Packed = (np.uint8, 8, Packing.UNKNOWN, "")
 
-    def __init__(self, v1: np_dtypes, v2: int, v3: Packing):
+    # v4 is the name of a Bayer format, which also keeps the Bayer members from being aliases of each other
+    def __init__(self, v1: np_dtypes, v2: int, v3: Packing, v4: str):
         self.v1 = v1
         self.v2 = v2
         self.v3 = v3
+        self.v4 = v4
 
     @property
     def nptype(self) -> np_dtypes:
@@ -71,12 +80,21 @@ class Datatypes(Enum):
     def packing(self) -> Packing:
         return self.v3
 
+    @property
+    def bayerpattern(self) -> str:
+        """Colour order of the top-left 2x2 block of the mosaic (e.g. "RG"), empty if not a Bayer format"""
+        return self.v4[5:7]
+
 
 def getdatatype(datatype: str = "", pixelformat: str = "") -> Datatypes:
     if pixelformat == "Mono8":
         return Datatypes.Mono8
     if pixelformat == "Mono12p":
         return Datatypes.Mono12p
+    if pixelformat.startswith("Bayer") and pixelformat in Datatypes.__members__:
+        bayer = Datatypes[pixelformat]
+        if bayer.bits in (8, 16) or bayer.packing != Packing.UNKNOWN:  # only formats that can be unpacked
+            return bayer
     if datatype == "UINT8":
         return Datatypes.UINT8
     if datatype == "UINT16":
@@ -0,0 +1,98 @@
+"""
+Bilinear demosaicing of Bayer mosaics, vectorized over all frames of a .fli file
+
+(c) R.Harkes NKI
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from .datatypes import np_dtypes
+
+# colour order of the top-left 2x2 block for each Bayer pattern
+_LAYOUTS = {
+    "RG": ("RG", "GB"),
+    "BG": ("BG", "GR"),
+    "GB": ("GB", "RG"),
+    "GR": ("GR", "BG"),
+}
+# interpolation kernels, normalised by the convolved sampling mask so the image borders are exact too
+_KERNEL_RB = np.array([[1, 2, 1], [2, 4, 2], [1, 2, 1]], dtype=np.float32)
+_KERNEL_G = np.array([[0, 1, 0], [1, 4, 1], [0, 1, 0]], dtype=np.float32)
+
+CHUNKBYTES = 64 * 1024 * 1024  # size of the float32 working buffer per colour
+
+
+def bayermasks(pattern: str, shape: tuple[int, int]) -> npt.NDArray[np.bool_]:
+    """
+    Sampling masks of the red, green and blue pixels of a Bayer mosaic
+    :param pattern: colour order of the top-left 2x2 block, one of RG, BG, GB, GR
+    :param shape: (y, x) size of the mosaic
+    :return: boolean array of shape (3, y, x)
+    """
+    if pattern not in _LAYOUTS:
+        raise ValueError(f"Unknown Bayer pattern: {pattern}")
+    masks = np.zeros((3, shape[0], shape[1]), dtype=np.bool_)
+    for row, colours in enumerate(_LAYOUTS[pattern]):
+        for col, colour in enumerate(colours):
+            masks["RGB".index(colour), row::2, col::2] = True
+    return masks
+
+
+def _convolve3x3(data: npt.NDArray[np.float32], kernel: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+    """Zero-padded 3x3 convolution over the last two axes"""
+    padded = np.zeros((*data.shape[:-2], data.shape[-2] + 2, data.shape[-1] + 2), dtype=np.float32)
+    padded[..., 1:-1, 1:-1] = data
+    result = np.zeros(data.shape, dtype=np.float32)
+    h, w = data.shape[-2:]
+    for dy in range(3):
+        for dx in range(3):
+            if kernel[dy, dx] != 0:
+                result += kernel[dy, dx] * padded[..., dy : dy + h, dx : dx + w]
+    return result
+
+
+def debayer(
+    data: np.ndarray[Any, np.dtype[np_dtypes]], pattern: str, chunkbytes: int = CHUNKBYTES
+) -> np.ndarray[Any, np.dtype[np_dtypes]]:
+    """
+    Bilinear demosaic of one or more Bayer mosaics. All leading axes are treated as frames and are
+    processed together, a chunk of frames at a time to limit the size of the intermediate arrays.
+    :param data: mosaic(s) with y,x as the last two axes
+    :param pattern: colour order of the top-left 2x2 block, one of RG, BG, GB, GR
+    :param chunkbytes: approximate size of the float32 working buffer
+    :return: numpy.ndarray with the same dtype and an extra last axis with R,G,B
+    """
+    h, w = data.shape[-2:]
+    if h < 2 or w < 2:
+        raise ValueError("A Bayer mosaic needs at least 2x2 pixels")
+    masks = bayermasks(pattern, (h, w))
+    weights = [
+        _convolve3x3(masks[c].astype(np.float32), _KERNEL_G if c == 1 else _KERNEL_RB) for c in range(3)
+    ]
+    frames = data.reshape(-1, h, w)
+    result = np.empty((frames.shape[0], h, w, 3), dtype=data.dtype)
+    step = max(1, chunkbytes // (4 * h * w))
+    for start in range(0, frames.shape[0], step):
+        chunk = frames[start : start + step].astype(np.float32)
+        for c in range(3):
+            rgb = _convolve3x3(chunk * masks[c], _KERNEL_G if c == 1 else _KERNEL_RB) / weights[c]
+            if np.issubdtype(data.dtype, np.integer):
+                np.rint(rgb, out=rgb)
+            result[start : start + step, ..., c] = rgb
+    return result.reshape((*data.shape, 3))
@@ -20,6 +20,9 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import logging
 import os
 import zlib
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
@@ -27,7 +30,24 @@ import numpy as np
 import numpy.typing as npt
 
 from .datatypes import Datatypes, Packing, np_dtypes
-from .readheader import readheader, telldatainfo
+from .demosaic import debayer
+from .readheader import DataInfo, parselist, readheader, telldatainfo, tellsection
+
+log = logging.getLogger("flifile")
+
+MAPBYTES = 64 * 1024 * 1024  # maximum size of the packed frames of a map_frames task
+
+_FRAMEDIMS = {"c": 0, "x": 1, "y": 2, "z": 3, "p": 4}  # index in IMSize
+_FLIDATATYPES = {
+    np.dtype(np.uint8): "UINT8",
+    np.dtype(np.uint16): "UINT16",
+    np.dtype(np.uint32): "UINT32",
+    np.dtype(np.int8): "INT8",
+    np.dtype(np.int16): "INT16",
+    np.dtype(np.int32): "INT32",
+    np.dtype(np.float32): "REAL32",
+    np.dtype(np.float64): "REAL64",
+}
 
 
 class FliFile:
@@ -36,12 +56,18 @@ class FliFile:
     Contains:
     - header: dictionary with all header entries
     - path: pathlib.Path to the file
+    - datainfo: DataInfo with data information based on the header
     Hidden:
-    - _bg: to store the background
-    - _datastart: pointer to the start of the data
-    - _di: dictionary with data information based on the header
+    - _bg: to store the background, averaged over the dark images for version 2.0
+    - _lists: to store the list valued header entries that have been parsed
+    - _header: the header, None until it is read again after unpickling
+    - _headerend: pointer to the start of the data, None until the header is read
+    - _identity: size and modification time of the file when it was opened
+    A pickled FliFile only contains path, _identity and datainfo. The header is read again when needed.
     """
 
+    __slots__ = ("path", "datainfo", "_bg", "_lists", "_header", "_headerend", "_identity")
+
     def __init__(self, filepath: str | os.PathLike[Any]) -> None:
         # open file
         if isinstance(filepath, str):
@@ -52,24 +78,85 @@ class FliFile:
             raise ValueError("not a valid filename")
         if self.path.suffix != ".fli":
             raise ValueError("Not a valid extension")
-        self.log = logging.getLogger("flifile")
-        self.header, self._datastart = readheader(self.path)
-        self.datainfo = telldatainfo(self.header)
+        stat = self.path.stat()
+        self._identity = (stat.st_size, stat.st_mtime_ns)
+        self._header: dict[str, dict[str, dict[str, str]]] | None
+        self._headerend: int | None
+        self._header, self._headerend = readheader(self.path)
+        self.datainfo = telldatainfo(self._header)
         self._bg: npt.NDArray[np_dtypes] = np.array([], dtype=self.datainfo.BGType.nptype)
+        self._lists: dict[str, npt.NDArray[np.float64]] = {}
+
+    def __getstate__(self) -> tuple[Path, tuple[int, int], DataInfo]:
+        return self.path, self._identity, self.datainfo
+
+    def __setstate__(self, state: tuple[Path, tuple[int, int], DataInfo]) -> None:
+        self.path, self._identity, self.datainfo = state
+        self._header = None
+        self._headerend = None
+        self._bg = np.array([], dtype=self.datainfo.BGType.nptype)
+        self._lists = {}
+
+    @property
+    def header(self) -> dict[str, dict[str, dict[str, str]]]:
+        if self._header is None:
+            self._header, self._headerend = self._reopen()
+        return self._header
+
+    @property
+    def _datastart(self) -> int:
+        if self._headerend is None:
+            self._header, self._headerend = self._reopen()
+        return self._headerend
+
+    def _reopen(self) -> tuple[dict[str, dict[str, dict[str, str]]], int]:
+        """Reads the header of an unpickled FliFile, after checking that the file has not changed"""
+        stat = self.path.stat()
+        if (stat.st_size, stat.st_mtime_ns) != self._identity:
+            raise ValueError(f"{self.path.name} has changed since it was opened")
+        return readheader(self.path)
 
     def getdata(
-        self, subtractbackground: bool = True, squeeze: bool = True
+        self,
+        subtractbackground: bool = True,
+        squeeze: bool = True,
+        demosaic: bool = False,
+        recover: bool = False,
     ) -> np.ndarray[Any, np.dtype[np_dtypes]]:
         """
         Returns the data from the .fli file. If squeeze is False the data is retured with these dimensions:
         frequency,time,phase,z,y,x,channel
         :param subtractbackground: Subtract the background from the image data
         :param squeeze: Return data without singleton dimensions in x,y,ph,t,z,fr,c order
+        :param demosaic: Convert Bayer data to RGB, the channel dimension then holds R,G,B
+        :param recover: Return only the complete timestamps of a truncated file instead of raising an error
         :return: numpy.ndarray
         """
         if not self.datainfo.BG_present:
             subtractbackground = False
-        datasize = int(np.prod(self.datainfo.IMSize, dtype=np.uint64))
+        if demosaic and not self.datainfo.IMType.bayerpattern:
+            log.warning("WARNING: Data is not in a Bayer format, not demosaicing")
+            demosaic = False
+        if demosaic and self.datainfo.IMSize[0] != 1:
+            raise ValueError("Can only demosaic data with a single channel")
+        imsize = self.datainfo.IMSize
+        if self.datainfo.Compression == 0:
+            self._checkpayload()
+            available = self.path.stat().st_size - self._datastart
+            needed = self._imagebytes()
+            if subtractbackground and self._bg.size == 0:
+                needed += self._backgroundbytes()
+            if available < needed:
+                if not recover:
+                    raise ValueError(
+                        f"{self.path.name} is truncated, {available} of {needed} data bytes present. "
+                        "Use getdata(recover=True) to get the complete timestamps."
+                    )
+                if subtractbackground and self._bg.size == 0:
+                    log.warning("WARNING: Background is missing from truncated file, not subtracting")
+                    subtractbackground = False
+                imsize = (*imsize[:5], self.completeframes(), imsize[6])
+        datasize = int(np.prod(imsize, dtype=np.uint64))
         if self.datainfo.Compression > 0:
             fid = self.path.open(mode="rb")
             fid.seek(self._datastart)
@@ -88,12 +175,14 @@ class FliFile:
             )
         if self.datainfo.IMType.bits == 12:  # 12 bit per pixel packed per 2 in 3 bytes
             data = self._convert_12_bit(data, datatype=self.datainfo.IMType)
-        data = data.reshape(self.datainfo.IMSize[::-1])
+        data = data.reshape(imsize[::-1])
         if subtractbackground:
             self._bg = self.getbackground(squeeze=False)
             mask = np.where(data < self._bg)
             data = data - self._bg
             data[mask] = 0
+        if demosaic:
+            data = debayer(data[..., 0], self.datainfo.IMType.bayerpattern)
         if squeeze:
             data = np.squeeze(data.transpose((5, 4, 2, 1, 3, 0, 6)))  # x,y,ph,t,z,fr,c
 
@@ -107,37 +196,166 @@ class FliFile:
         :return: numpy.ndarray
         """
         if not self.datainfo.BG_present:
-            self.log.warning("WARNING: No background present in file")
+            log.warning("WARNING: No background present in file")
             return np.array([])
         if self._bg.size != 0:
             data = self._bg
         else:
             if self.datainfo.Compression > 0:
-                self.log.warning(
+                log.warning(
                     "WARNING: Getting background before getting data is inefficient in compressed files."
                 )
                 self.getdata(subtractbackground=True, squeeze=False)
                 data = self._bg
             else:
-                offset = (
-                    self._datastart
-                    + (self.datainfo.IMType.bits * int(np.prod(self.datainfo.IMSize, dtype=np.uint64))) / 8
-                )
-                datasize = int(np.prod(self.datainfo.BGSize, dtype=np.uint64))
-                data = self._get_data_from_file(
-                    offset=int(offset), datatype=self.datainfo.BGType, datasize=datasize
-                )
-                if self.datainfo.BGType.bits == 12:  # 12 bit per pixel packed per 2 in 3 bytes
-                    data = self._convert_12_bit(
-                        data,
-                        datatype=self.datainfo.BGType,
+                self._checkpayload()
+                offset = self._datastart + self._imagebytes()
+                available = self.path.stat().st_size - offset
+                if available < self._backgroundbytes():
+                    raise ValueError(
+                        f"{self.path.name} is truncated, {available} of {self._backgroundbytes()} "
+                        "background bytes present"
                     )
-                data = data.reshape(self.datainfo.BGSize[::-1])
+                data = self._averagebackground(offset=offset).reshape(self.datainfo.BGSize[::-1])
+                self._bg = data
         if squeeze:
             return np.squeeze(data.transpose((5, 4, 2, 1, 3, 0, 6)))  # x,y,ph,t,z,fr,c
         else:
             return data
 
+    def getlist(self, key: str) -> npt.NDArray[np.float64]:
+        """
+        Returns a list valued header entry (e.g. lut, exposureTime, timestamps, phases, frequencies) as array.
+        The entry is parsed on first access and cached.
+        :param key: name of the header entry
+        :return: read-only numpy.ndarray
+        """
+        if key not in self._lists:
+            section = tellsection(self.header)
+            if key not in section:
+                raise KeyError(f"No {key} in header")
+            self._lists[key] = parselist(section[key])
+        return self._lists[key]
+
+    @property
+    def timestamps(self) -> npt.NDArray[np.float64]:
+        """Timestamps of the frames, empty if the header has none (version 1.0 only stores their number)"""
+        if self.datainfo.version != "2.0":
+            return parselist("")
+        return self.getlist("timestamps")
+
+    @property
+    def exposuretimes(self) -> npt.NDArray[np.float64]:
+        """Exposure times from the header"""
+        return self.getlist("exposureTime")
+
+    def verify(self) -> bool:
+        """
+        Checks if the file is complete by comparing its size with the size expected from the header.
+        No data is read. For compressed files only the presence of data after the header is checked.
+        :return: True if all data is present
+        :raises ValueError: if payloadSize in the header differs from the size of the packed frames
+        """
+        size = self.path.stat().st_size
+        if self.datainfo.Compression > 0:
+            return size > self._datastart
+        self._checkpayload()
+        expected = self._datastart + self._imagebytes() + self._backgroundbytes()
+        return size >= expected
+
+    def completeframes(self) -> int:
+        """
+        Returns the number of timestamps of which all data is present in the file
+        :return: int
+        """
+        if self.datainfo.Compression > 0:
+            raise ValueError("Can not count the complete timestamps of a compressed file")
+        if self.datainfo.IMSize[6] != 1:
+            raise ValueError("Can only count the complete timestamps of files with a single frequency")
+        self._checkpayload()
+        available = self.path.stat().st_size - self._datastart
+        framebits = self.datainfo.IMType.bits * self._framepixels()
+        return max(0, min(self.datainfo.IMSize[5], (8 * available) // framebits))
+
+    def map_frames(
+        self,
+        func: Callable[[npt.NDArray[Any]], npt.NDArray[Any]],
+        out: str | os.PathLike[Any] | npt.NDArray[Any],
+        workers: int | None = None,
+        axes: str = "xy",
+        batch: int | None = None,
+        threads: bool = False,
+        subtractbackground: bool = True,
+    ) -> npt.NDArray[Any]:
+        """
+        Applies func to every frame of the file in a pool of workers and writes the results in order to out.
+        Each task reads and decodes only its own batch of frames, so the file is never fully in memory.
+        The items passed to func have the dimensions in axes, from x, y, p(hase), z and c(hannel). The other
+        dimensions are iterated over together with time and frequency, in file order.
+        :param func: function applied to each item, must be picklable unless threads is True
+        :param out: array or memmap of shape (items, *result shape), or the path of a new .npy or .fli file.
+        A .fli file can only be written for 2D results with axes "xy" or "yx".
+        :param workers: Number of workers, the number of processors if None
+        :param axes: dimensions of the items passed to func
+        :param batch: Number of frames that is decoded and processed per task, chosen from the size if None
+        :param threads: Use a thread pool instead of a process pool
+        :param subtractbackground: Subtract the background from the frames before func is applied
+        :return: the array with the results, a numpy.memmap for .npy and .fli files
+        """
+        if self.datainfo.Compression > 0:
+            raise ValueError("Can not map the frames of a compressed file")
+        if not set(axes) <= set(_FRAMEDIMS) or len(set(axes)) != len(axes) or not {"x", "y"} <= set(axes):
+            raise ValueError(f"Not valid axes: {axes}, use x, y and optionally p, z and c")
+        outpath = None if isinstance(out, np.ndarray) else Path(out)
+        if outpath is not None and outpath.suffix not in (".npy", ".fli"):
+            raise ValueError("Not a valid extension for the output, use .npy or .fli")
+        if outpath is not None and outpath.suffix == ".fli" and axes not in ("xy", "yx"):
+            raise ValueError('A .fli file can only be written with axes "xy" or "yx"')
+        if not self.verify():
+            raise ValueError(
+                f"{self.path.name} is truncated, use getdata(recover=True) for the complete data"
+            )
+        nframes = self.datainfo.IMSize[5] * self.datainfo.IMSize[6]
+        itemsperframe = int(np.prod([self.datainfo.IMSize[_FRAMEDIMS[d]] for d in "pzc" if d not in axes]))
+        if nframes * itemsperframe == 0:
+            raise ValueError("No frames in file")
+        bg = self.getbackground(squeeze=False) if subtractbackground and self.datainfo.BG_present else None
+        workers = workers or os.cpu_count() or 1
+        framebytes = (self.datainfo.IMType.bits * self._framepixels()) // 8
+        if batch is None:  # contiguous ranges of frames, a few per worker but limited in size
+            batch = min(-(-nframes // (4 * workers)), max(1, MAPBYTES // max(1, framebytes)))
+        batch = max(1, batch)
+        if self.datainfo.IMType.bits == 12 and self._framepixels() % 2:
+            batch += batch % 2  # a pair of frames with an odd number of 12 bit pixels starts on a byte
+        result = out if isinstance(out, np.ndarray) else None
+
+        def write(first: int, future: Future[npt.NDArray[Any]]) -> None:
+            nonlocal result
+            items = future.result()
+            if outpath is not None and outpath.suffix == ".fli" and axes == "xy" and items.ndim == 3:
+                items = items.swapaxes(1, 2)  # a .fli file stores y,x, _openoutput rejects other shapes
+            if result is None and outpath is not None:
+                result = _openoutput(outpath, (nframes * itemsperframe, *items.shape[1:]), items.dtype)
+            if result is not None:
+                result[first * itemsperframe : first * itemsperframe + items.shape[0]] = items
+
+        pool = ThreadPoolExecutor(workers) if threads else ProcessPoolExecutor(workers)
+        with pool:
+            inflight: deque[tuple[int, Future[npt.NDArray[Any]]]] = deque()
+            for start in range(0, nframes, batch):
+                if len(inflight) >= 2 * workers:  # bound the number of decoded batches in memory
+                    write(*inflight.popleft())
+                stop = min(start + batch, nframes)
+                task = (self.path, self.datainfo, self._datastart, start, stop, bg)
+                inflight.append((start, pool.submit(_mapframes, func, axes, *task)))
+            while inflight:
+                write(*inflight.popleft())
+        if result is None:
+            raise ValueError("No results")
+        if isinstance(result, np.memmap):
+            result.flush()
+        return result
+
     def getframe(
         self,
         channel: int = 0,
@@ -162,24 +380,68 @@ class FliFile:
         """
         # check input
         if channel > (self.datainfo.IMSize[0] - 1):
-            self.log.warning("WARNING: Channel out of range")
+            log.warning("WARNING: Channel out of range")
             return np.array([])
         if z > (self.datainfo.IMSize[3] - 1):
-            self.log.warning("WARNING: Z out of range")
+            log.warning("WARNING: Z out of range")
             return np.array([])
         if phase > (self.datainfo.IMSize[4] - 1):
-            self.log.warning("WARNING: Phase out of range")
+            log.warning("WARNING: Phase out of range")
             return np.array([])
         if timestamp > (self.datainfo.IMSize[5] - 1):
-            self.log.warning("WARNING: Timestamp out of range")
+            log.warning("WARNING: Timestamp out of range")
             return np.array([])
         if frequency > (self.datainfo.IMSize[6] - 1):
-            self.log.warning("WARNING: Frequency out of range")
+            log.warning("WARNING: Frequency out of range")
             return np.array([])
         # get pointer
         return np.array([])
         # get data
 
+    def _framepixels(self) -> int:
+        return int(np.prod(self.datainfo.IMSize[:5], dtype=np.uint64))
+
+    def _checkpayload(self) -> None:
+        """The readers assume packed frames, this raises if payloadSize says the frames are padded"""
+        payloadsize = tellsection(self.header).get("payloadSize", "")
+        framebytes = (self.datainfo.IMType.bits * self._framepixels() + 7) // 8
+        if payloadsize and int(payloadsize) != framebytes:
+            raise ValueError(
+                f"{self.path.name} has a payloadSize of {payloadsize} bytes per frame, but frames of "
+                f"{framebytes} bytes. Frames with padding or chunk data can not be read."
+            )
+
+    def _imagebytes(self) -> int:
+        """Number of bytes of the packed image data, _checkpayload checks that payloadSize agrees"""
+        return (self.datainfo.IMType.bits * int(np.prod(self.datainfo.IMSize, dtype=np.uint64)) + 7) // 8
+
+    def _backgroundbytes(self) -> int:
+        if not self.datainfo.BG_present:
+            return 0
+        datasize = int(np.prod(self.datainfo.BGSize, dtype=np.uint64))
+        return self.datainfo.BGCount * ((self.datainfo.BGType.bits * datasize) // 8)
+
+    def _averagebackground(self, offset: int) -> np.ndarray[Any, np.dtype[np_dtypes]]:
+        """
+        Reads the BGCount background images that start at offset and returns their average.
+        The images are read one at a time, so only a single image and the running sum are in memory.
+        """
+        datatype = self.datainfo.BGType
+        datasize = int(np.prod(self.datainfo.BGSize, dtype=np.uint64))
+        nbytes = (datatype.bits * datasize) // 8
+        total = np.zeros(datasize, dtype=np.float64)
+        for i in range(self.datainfo.BGCount):
+            data = self._get_data_from_file(offset=offset + i * nbytes, datatype=datatype, datasize=datasize)
+            if datatype.bits == 12:  # 12 bit per pixel packed per 2 in 3 bytes
+                data = self._convert_12_bit(data, datatype=datatype)
+            if self.datainfo.BGCount == 1:
+                return data
+            total += data
+        total /= self.datainfo.BGCount
+        if np.issubdtype(datatype.nptype, np.integer):
+            np.rint(total, out=total)
+        return total.astype(datatype.nptype)
+
     @staticmethod
     def _convert_12_bit(
         data: np.ndarray[Any, np.dtype[np_dtypes]], datatype: Datatypes
@@ -222,3 +484,99 @@ class FliFile:
 
     def __str__(self) -> str:
         return self.path.name
+
+
+def verifyall(
+    directory: str | os.PathLike[Any], recursive: bool = False, workers: int | None = None
+) -> dict[Path, bool]:
+    """
+    Verifies all .fli files in a directory in parallel, see FliFile.verify
+    :param directory: directory with .fli files
+    :param recursive: Also verify the files in subdirectories
+    :param workers: Number of processes, the number of processors if None
+    :return: dictionary with the result per file
+    """
+    directory = Path(directory)
+    files = sorted(directory.rglob("*.fli") if recursive else directory.glob("*.fli"))
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(files) // (4 * workers))  # a few round trips per process instead of one per file
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(files, executor.map(_verifyfile, files, chunksize=chunksize), strict=True))
+
+
+def _readframes(
+    path: Path,
+    datainfo: DataInfo,
+    datastart: int,
+    start: int,
+    stop: int,
+    bg: np.ndarray[Any, np.dtype[np_dtypes]] | None,
+) -> np.ndarray[Any, np.dtype[np_dtypes]]:
+    """
+    Reads frames start to stop, counted over time and frequency, as frame,phase,z,y,x,channel
+    """
+    datatype = datainfo.IMType
+    framepixels = int(np.prod(datainfo.IMSize[:5], dtype=np.uint64))
+    datasize = (stop - start) * framepixels
+    offset = datastart + (start * framepixels * datatype.bits) // 8
+    data: npt.NDArray[np_dtypes]
+    if datatype.bits == 12:  # 12 bit per pixel packed per 2 in 3 bytes
+        data = np.fromfile(path, offset=offset, dtype=np.uint8, count=(3 * datasize + 1) // 2)
+        data = np.pad(data, (0, -data.size % 3))  # an odd number of pixels ends halfway a pair
+        data = FliFile._convert_12_bit(data, datatype=datatype)[:datasize]
+    else:
+        data = np.fromfile(path, offset=offset, dtype=datatype.nptype, count=datasize)
+    data = data.reshape((stop - start, *datainfo.IMSize[4::-1]))
+    if bg is not None:
+        bg = bg[0, 0]  # background of a single timestamp and frequency
+        mask = np.where(data < bg)
+        data = data - bg
+        data[mask] = 0
+    return data
+
+
+def _mapframes(
+    func: Callable[[npt.NDArray[Any]], npt.NDArray[Any]],
+    axes: str,
+    path: Path,
+    datainfo: DataInfo,
+    datastart: int,
+    start: int,
+    stop: int,
+    bg: np.ndarray[Any, np.dtype[np_dtypes]] | None,
+) -> npt.NDArray[Any]:
+    """
+    Task of FliFile.map_frames: decodes frames start to stop and applies func to each item.
+    It gets the data offset instead of a FliFile, so the worker does not have to read the header again.
+    """
+    frames = _readframes(path, datainfo, datastart, start, stop, bg)
+    layout = "pzyxc"  # dimensions of a frame after the first
+    other = [d for d in "pzc" if d not in axes]
+    order = (0, *[1 + layout.index(d) for d in other], *[1 + layout.index(d) for d in axes])
+    shape = [frames.shape[1 + layout.index(d)] for d in axes]
+    items = frames.transpose(order).reshape(-1, *shape)
+    return np.stack([func(item) for item in items])
+
+
+def _openoutput(path: Path, shape: tuple[int, ...], dtype: np.dtype[Any]) -> npt.NDArray[Any]:
+    """Creates a .npy or .fli file of the given shape and returns it as memmap"""
+    if path.suffix == ".npy":
+        result: npt.NDArray[Any] = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        return result
+    if dtype not in _FLIDATATYPES or len(shape) != 3:
+        raise ValueError(f"Can not write results of {dtype} with shape {shape[1:]} to a .fli file")
+    header = (
+        "{FLIMIMAGE}\n[INFO]\nversion = 1.0\ncompression = 0\n[LAYOUT]\n"
+        f"datatype = {_FLIDATATYPES[dtype]}\nchannels = 1\nx = {shape[2]}\ny = {shape[1]}\nz = 1\n"
+        f"phases = 1\ntimestamps = {shape[0]}\nfrequencies = 1\nhasDarkImage = 0\n{{END}}"
+    ).encode()
+    with path.open(mode="wb") as f:
+        f.write(header)
+    return np.memmap(path, mode="r+", dtype=dtype, offset=len(header), shape=shape)
+
+
+def _verifyfile(path: Path) -> bool:
+    try:
+        return FliFile(path).verify()
+    except (OSError, ValueError, KeyError):  # unreadable file or header
+        return False
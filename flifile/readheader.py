@@ -1,25 +1,30 @@
 import os
-from collections import deque
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, BinaryIO
 
+import numpy as np
+import numpy.typing as npt
+
 from flifile.datatypes import Datatypes, getdatatype
 
 
 def readheadersize(f: BinaryIO) -> int:
     """
-    Bit convoluted, since you can probably just aswell read a 4kb page,
-    check if it already contains {END} and trim to get the header, or expand with another 4kb.
-    But using deque is fun.
+    Reads 4kb pages until one contains {END} and returns the position just after it.
+    The search starts a few bytes before each new page, in case {END} is split over two pages.
     """
-    queue = deque([b" ", b" ", b" ", b" ", b" "], maxlen=5)
-    stop = deque([b"{", b"E", b"N", b"D", b"}"], maxlen=5)
+    start = f.tell()
+    buffer = b""
     while True:
-        byte = f.read(1)
-        queue.append(byte)
-        if queue == stop:
-            return f.tell()
+        page = f.read(4096)
+        if not page:
+            raise ValueError("No end of header found")
+        searchfrom = max(0, len(buffer) - 4)
+        buffer += page
+        end = buffer.find(b"{END}", searchfrom)
+        if end >= 0:
+            return start + end + 5
 
 
 def readheader(
@@ -72,7 +77,39 @@ def tellversion(header: dict[str, dict[str, dict[str, str]]]) -> str:
     return version
 
 
-@dataclass
+def countentries(value: str) -> int:
+    """Number of entries in a list valued header entry, without splitting it, ignoring a trailing comma"""
+    return value.strip().strip("{}[]").strip().rstrip(",").count(",") + 1
+
+
+def parselist(value: str) -> npt.NDArray[np.float64]:
+    """
+    Parses a list valued header entry like "[0, 1, 2]" in a single vectorized pass
+    :param value: header entry
+    :return: read-only numpy.ndarray
+    """
+    value = value.strip().strip("{}[]").strip().rstrip(",")  # a trailing comma would parse as -1
+    if value.strip():
+        result = np.fromstring(value, dtype=np.float64, sep=",")
+        if result.size != countentries(value):
+            raise ValueError(f"Not a list of numbers: {value}")
+    else:
+        result = np.array([], dtype=np.float64)
+    result.flags.writeable = False
+    return result
+
+
+def tellsection(header: dict[str, dict[str, dict[str, str]]]) -> dict[str, str]:
+    """Returns the header section with the layout of the data, which depends on the version"""
+    version = tellversion(header)
+    if version == "1.0":
+        return header["FLIMIMAGE"]["LAYOUT"]
+    if version == "2.0":
+        return header["FLIMIMAGE"]["DEFAULT"] if "FLIMIMAGE" in header else header["DEFAULT"]["DEFAULT"]
+    return {}
+
+
+@dataclass(slots=True)
 class DataInfo:
     version: str
     IMSize: tuple[int, int, int, int, int, int, int]  # ch, x, y, z, ph, t, freq
@@ -81,6 +118,7 @@ class DataInfo:
     BG_present: bool
     BGSize: tuple[int, int, int, int, int, int, int]  # ch, x, y, z, ph, t, freq
     BGType: Datatypes
+    BGCount: int  # number of background images that are averaged into one of BGSize
     valid: bool
 
     def __bool__(self) -> bool:
@@ -95,6 +133,7 @@ def telldatainfo(header: dict[str, dict[str, dict[str, str]]]) -> DataInfo:
     bgpresent = False
     bgsize = (0, 0, 0, 0, 0, 0, 0)
     bgtype = Datatypes.UINT8
+    bgcount = 0
     valid = False
     if version == "1.0":
         imsize = (
@@ -137,12 +176,12 @@ def telldatainfo(header: dict[str, dict[str, dict[str, str]]]) -> DataInfo:
                 header["FLIMIMAGE"]["LAYOUT"].get("datatype", ""),
                 header["FLIMIMAGE"]["LAYOUT"].get("pixelFormat", ""),
             )
+        bgcount = int(bgpresent)
         valid = True
     elif version == "2.0":
-        ch = len(header["FLIMIMAGE"]["DEFAULT"]["channels"].strip("{}[]").split(","))
-        ph = len(header["FLIMIMAGE"]["DEFAULT"]["phases"].strip("{}[]").split(","))
-        _ = len(header["FLIMIMAGE"]["DEFAULT"]["timestamps"].strip("{}[]").split(","))  # seems unused
-        fr = len(header["FLIMIMAGE"]["DEFAULT"]["frequencies"].strip("{}[]").split(","))
+        ch = countentries(header["FLIMIMAGE"]["DEFAULT"]["channels"])
+        ph = countentries(header["FLIMIMAGE"]["DEFAULT"]["phases"])
+        fr = countentries(header["FLIMIMAGE"]["DEFAULT"]["frequencies"])
         imsize = (
             ch,
             int(header["FLIMIMAGE"]["DEFAULT"]["x"]),
@@ -157,7 +196,8 @@ def telldatainfo(header: dict[str, dict[str, dict[str, str]]]) -> DataInfo:
             header["FLIMIMAGE"]["DEFAULT"]["pixelFormat"],
         )
         compression = 0
-        bgpresent = False
+        bgcount = int(header["FLIMIMAGE"]["DEFAULT"].get("numberOfDarkImages", "0"))
+        bgpresent = bgcount > 0
         bgsize = (
             1,
             imsize[1],
@@ -178,5 +218,6 @@ def telldatainfo(header: dict[str, dict[str, dict[str, str]]]) -> DataInfo:
         BG_present=bgpresent,
         BGSize=bgsize,
         BGType=bgtype,
+        BGCount=bgcount,
         valid=valid,
     )
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest as pytest
+
+from flifile import FliFile
+from flifile.datatypes import Datatypes, getdatatype
+from flifile.demosaic import bayermasks, debayer
+from tests.testdata.synthetic import writefli
+
+
+def testgetdatatype():
+    assert getdatatype("", "BayerRG12p") is Datatypes.BayerRG12p
+    assert getdatatype("", "BayerGB8").bayerpattern == "GB"
+    assert Datatypes.BayerBG16 is not Datatypes.UINT16
+    assert Datatypes.Mono12p.bayerpattern == ""
+    for name in ("BayerRG8", "BayerRG10", "BayerRG12", "BayerRG16", "BayerGR8", "BayerGR12p", "BayerBG12"):
+        assert getdatatype("", name).name == name
+    assert getdatatype("", "BayerGR16").bayerpattern == "GR"
+    assert getdatatype("", "BayerRG12Packed").bayerpattern == ""  # GenICam 12Packed can not be unpacked
+
+
+def testmasks():
+    masks = bayermasks("RG", (4, 4))
+    assert masks.sum(axis=0).min() == 1
+    assert masks[0, 0, 0] and masks[1, 0, 1] and masks[1, 1, 0] and masks[2, 1, 1]
+
+
+@pytest.mark.parametrize("pattern", ["RG", "BG", "GB", "GR"])
+def testdebayer(pattern):
+    rng = np.random.default_rng(0)
+    mosaic = rng.integers(0, 4096, size=(5, 8, 10), dtype=np.uint16)
+    rgb = debayer(mosaic, pattern, chunkbytes=1)  # one frame per chunk
+    assert rgb.shape == (5, 8, 10, 3)
+    assert rgb.dtype == np.uint16
+    masks = bayermasks(pattern, (8, 10))
+    for c in range(3):  # sampled pixels are kept
+        assert np.array_equal(rgb[..., c][:, masks[c]], mosaic[:, masks[c]])
+    assert np.array_equal(rgb, debayer(mosaic, pattern))
+    flat = np.full((2, 6, 6), 100, dtype=np.uint8)
+    assert np.all(debayer(flat, pattern) == 100)
+
+
+def testgetdata(tmp_path):
+    mosaic = np.arange(2 * 4 * 6, dtype=np.uint8).reshape(2, 4, 6)
+    path = tmp_path / "bayer.fli"
+    writefli(path, "BayerGB8", mosaic)
+    fli = FliFile(path)
+    assert fli.datainfo.IMType is Datatypes.BayerGB8
+    raw = fli.getdata(squeeze=False)
+    assert raw.shape == (1, 2, 1, 1, 4, 6, 1)
+    rgb = fli.getdata(squeeze=False, demosaic=True)
+    assert rgb.shape == (1, 2, 1, 1, 4, 6, 3)
+    assert np.array_equal(rgb[0, :, 0, 0], debayer(mosaic, "GB"))
+    assert fli.getdata(demosaic=True).shape == (6, 4, 2, 3)  # x,y,t,c
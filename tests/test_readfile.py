@@ -1,6 +1,144 @@
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pytest as pytest
+
+from flifile import FliFile, verifyall
+from flifile.datatypes import Datatypes
+from tests.testdata.synthetic import pack12, writefli
+
 datameans = {
     "FliFile1.0_DEV_1AB22C01C4FA_DS_0x0_02HH6.fli": 15.753081352601091,
     "FliFile2.0_DEV_1AB22C01C4FA_DS_0x0_02HH6.fli": 45.16429558899177,
     "FliFile1.0(1)_DEV_1AB22C01C4FA_DS_0x0_02HH6.fli": 260.88322276458223,
     "FliFile2.0(1)_DEV_1AB22C01C4FA_DS_0x0_02HH6.fli": 712.4043131248322,
 }
+
+
+def testdarkimages(tmp_path, monkeypatch):
+    data = np.full((3, 4, 6), 50, dtype=np.uint8)
+    dark = np.stack([np.full((4, 6), v, dtype=np.uint8) for v in (9, 10, 12)])
+    path = tmp_path / "dark.fli"
+    writefli(path, "Mono8", data, darkimages=dark)
+    fli = FliFile(path)
+    assert fli.datainfo.BG_present
+    assert fli.datainfo.BGCount == 3
+    bg = fli.getbackground()
+    assert bg.shape == (6, 4)
+    assert np.all(bg == 10)  # rounded average
+    reads = []
+    original = FliFile._get_data_from_file
+    monkeypatch.setattr(FliFile, "_get_data_from_file", lambda self, **kw: reads.append(kw) or original(self, **kw))
+    assert np.all(fli.getdata() == 40)
+    assert len(reads) == 1  # only the data is read, the background is cached
+    truncated = tmp_path / "darktruncated.fli"
+    truncated.write_bytes(path.read_bytes()[:-6])  # cut in the last dark image
+    fli = FliFile(truncated)
+    assert not fli.verify()
+    with pytest.raises(ValueError, match="truncated"):
+        fli.getbackground()
+
+
+def testverify(tmp_path):
+    data = np.arange(4 * 3 * 5, dtype=np.uint8).reshape(4, 3, 5)
+    path = tmp_path / "complete.fli"
+    writefli(path, "Mono8", data)
+    assert FliFile(path).verify()
+    truncated = tmp_path / "truncated.fli"
+    truncated.write_bytes(path.read_bytes()[:-20])  # last timestamp is incomplete
+    fli = FliFile(truncated)
+    assert not fli.verify()
+    assert fli.completeframes() == 2
+    with pytest.raises(ValueError, match="truncated"):
+        fli.getdata()
+    recovered = fli.getdata(recover=True, squeeze=False)
+    assert np.array_equal(recovered[0, :, 0, 0, :, :, 0], data[:2])
+    (tmp_path / "broken.fli").write_bytes(b"{FLIMIMAGE}\nversion = 2.0\n")  # no end of header
+    assert verifyall(tmp_path) == {path: True, tmp_path / "broken.fli": False, truncated: False}
+
+
+def testverifytestdata():
+    results = verifyall(Path("tests", "testdata"), workers=2)
+    assert len(results) == len(datameans)
+    assert not any(results.values())  # the test files only contain the header
+
+
+def testpickle(tmp_path):
+    data = np.arange(2 * 4 * 6, dtype=np.uint8).reshape(2, 4, 6)
+    path = tmp_path / "pickle.fli"
+    writefli(path, "Mono8", data, darkimages=data[:1])
+    fli = FliFile(path)
+    fli.getbackground()
+    state = pickle.dumps(fli)
+    assert len(state) < 1000  # no header or background
+    copy = pickle.loads(state)
+    assert copy.datainfo == fli.datainfo
+    assert copy._header is None
+    assert np.array_equal(copy.getdata(), fli.getdata())
+    assert copy.header == fli.header
+    assert not hasattr(fli, "__dict__")
+    copy = pickle.loads(state)
+    with path.open("ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ValueError, match="changed"):
+        copy.getdata()
+
+
+def double(frame):
+    return frame.astype(np.uint16) * 2
+
+
+def testmapframes(tmp_path):
+    data = np.arange(5 * 4 * 6, dtype=np.uint8).reshape(5, 4, 6)
+    path = tmp_path / "map.fli"
+    writefli(path, "Mono8", data, darkimages=np.ones((2, 4, 6), dtype=np.uint8))
+    fli = FliFile(path)
+    expected = (data.astype(np.int32) - 1).clip(0).astype(np.uint16) * 2  # background subtracted
+    out = np.zeros((5, 6, 4), dtype=np.uint16)
+    assert fli.map_frames(double, out, workers=2, batch=2, threads=True) is out
+    assert np.array_equal(out, expected.swapaxes(1, 2))  # items are x,y
+    npy = fli.map_frames(double, tmp_path / "out.npy", workers=2, axes="yx")
+    assert np.array_equal(np.load(tmp_path / "out.npy"), expected)
+    assert np.array_equal(npy, expected)
+    fli.map_frames(double, tmp_path / "out.fli", workers=2, batch=3, subtractbackground=False)
+    result = FliFile(tmp_path / "out.fli")
+    assert result.datainfo.IMType is Datatypes.UINT16
+    assert np.array_equal(result.getdata(squeeze=False)[0, :, 0, 0, :, :, 0], data.astype(np.uint16) * 2)
+    with pytest.raises(ValueError, match="axes"):
+        fli.map_frames(double, out, axes="xq")
+    with pytest.raises(ValueError, match="Can not write"):
+        fli.map_frames(np.sum, tmp_path / "sum.fli", threads=True)
+
+
+def testheaderpages(tmp_path):
+    data = np.zeros((1, 2, 2), dtype=np.uint8)
+    path = tmp_path / "pages.fli"
+    for padding in range(4080, 4100):  # {END} in, across and after the first 4kb page
+        writefli(path, "Mono8", data, extraheader="lutName = " + "x" * padding + "\n")
+        fli = FliFile(path)
+        assert fli._datastart == path.stat().st_size - data.size
+    writefli(path, "Mono8", data, extraheader="payloadSize = 8\n")
+    fli = FliFile(path)  # the header can be read, the padded frames can not
+    assert fli.header["FLIMIMAGE"]["DEFAULT"]["payloadSize"] == "8"
+    for method in (fli.verify, fli.getdata):
+        with pytest.raises(ValueError, match="payloadSize"):
+            method()
+
+
+def ident(frame):
+    return frame
+
+
+def testmapframes12bit(tmp_path):
+    data = np.arange(4 * 3 * 3, dtype=np.uint16).reshape(4, 3, 3) * 100  # odd number of pixels per frame
+    path = tmp_path / "mono12p.fli"
+    writefli(path, "Mono12p", data, raw=pack12(data))
+    fli = FliFile(path)
+    assert np.array_equal(fli.getdata(squeeze=False)[0, :, 0, 0, :, :, 0], data)
+    for batch in (1, 3, None):
+        out = fli.map_frames(ident, np.zeros((4, 3, 3), dtype=np.uint16), workers=2, axes="yx", batch=batch)
+        assert np.array_equal(out, data)
+    writefli(path, "Mono12p", data, raw=pack12(data)[:-1])
+    with pytest.raises(ValueError, match="truncated"):
+        FliFile(path).map_frames(ident, np.zeros((4, 3, 3), dtype=np.uint16))
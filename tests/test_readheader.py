@@ -1,7 +1,9 @@
+import numpy as np
 import pytest as pytest
 from pathlib import Path
 
-from flifile.readheader import readheader, tellversion, telldatainfo
+from flifile import FliFile
+from flifile.readheader import countentries, parselist, readheader, tellversion, telldatainfo
 from tests.testdata.headers import (
     returnheaders,
     returnversions,
@@ -51,3 +53,24 @@ def testheaders(files):
         assert tellversion(header) == versions[file.name]
         assert ds == datastarts[file.name]
         assert telldatainfo(header) == datainfos[file.name]
+
+
+def testlists(files):
+    for file in files:
+        fli = FliFile(file)
+        assert fli.timestamps.size == 0
+        assert fli.exposuretimes.size == 1
+        if fli.datainfo.version == "2.0":
+            lut = fli.getlist("lut")
+            assert lut is fli.getlist("lut")  # cached
+            assert lut.size == 768
+            assert lut.max() == 255
+            assert not lut.flags.writeable
+            assert fli.getlist("range")[0] == 0
+    assert np.array_equal(parselist("[1, 2.5,  3]"), [1, 2.5, 3])
+    assert parselist("{}").size == 0
+    assert np.array_equal(parselist("[ 1 , 2 , ]"), [1, 2])
+    assert countentries("[a, b, ]") == 2
+    assert countentries("{}") == 1  # as before, also for an empty list
+    with pytest.raises(ValueError):
+        parselist("[1,, 2]")
@@ -176,6 +176,7 @@ def returndatainfos() -> dict:
             BG_present=False,
             BGSize=(1, 1944, 1472, 1, 1, 1, 1),
             BGType=Datatypes.Mono12p,
+            BGCount=0,
             valid=True,
         ),
         "FliFile2.0(1)_DEV_1AB22C01C4FA_DS_0x0_02HH6.fli": DataInfo(
@@ -186,6 +187,7 @@ def returndatainfos() -> dict:
             BG_present=False,
             BGSize=(1, 1944, 1472, 1, 1, 1, 1),
             BGType=Datatypes.Mono12p,
+            BGCount=0,
             valid=True,
         ),
         "FliFile1.0_DEV_1AB22C01C4FA_DS_0x0_02HH6.fli": DataInfo(
@@ -196,6 +198,7 @@ def returndatainfos() -> dict:
             BG_present=False,
             BGSize=(1, 1944, 1472, 1, 1, 1, 1),
             BGType=Datatypes.UINT8,
+            BGCount=0,
             valid=True,
         ),
         "FliFile2.0_DEV_1AB22C01C4FA_DS_0x0_02HH6.fli": DataInfo(
@@ -206,6 +209,7 @@ def returndatainfos() -> dict:
             BG_present=False,
             BGSize=(1, 1944, 1472, 1, 1, 1, 1),
             BGType=Datatypes.UINT8,
+            BGCount=0,
             valid=True,
         ),
     }
@@ -0,0 +1,40 @@
+import numpy as np
+
+
+def writefli(path, pixelformat, data, darkimages=None, extraheader="", raw=None):
+    """Write a minimal version 2.0 .fli file with the frames in data (t, y, x), or raw bytes with that shape"""
+    frames, y, x = data.shape
+    ndark = 0 if darkimages is None else darkimages.shape[0]
+    header = (
+        "{FLIMIMAGE}\n"
+        "version = 2.0\n"
+        "channels = {}\n"
+        "frequencies = []\n"
+        f"numberOfDarkImages = {ndark}\n"
+        f"numberOfFrames = {frames}\n"
+        "phases = []\n"
+        f"pixelFormat = {pixelformat}\n"
+        "timestamps = []\n"
+        f"x = {x}\n"
+        f"y = {y}\n"
+        "z = 1\n"
+        f"{extraheader}"
+        "{END}"
+    )
+    with path.open("wb") as f:
+        f.write(header.encode("utf-8"))
+        f.write(np.ascontiguousarray(data).tobytes() if raw is None else raw)
+        if darkimages is not None:
+            f.write(np.ascontiguousarray(darkimages).tobytes())
+
+
+def pack12(data):
+    """Pack pixels to 12 bit LSB, 2 pixels per 3 bytes"""
+    pixels = data.ravel().astype(np.uint16)
+    if pixels.size % 2:
+        pixels = np.append(pixels, 0)
+    packed = np.empty((pixels.size // 2, 3), dtype=np.uint8)
+    packed[:, 0] = pixels[0::2] & 0xFF
+    packed[:, 1] = (pixels[0::2] >> 8) | ((pixels[1::2] & 0xF) << 4)
+    packed[:, 2] = pixels[1::2] >> 4
+    return packed.tobytes()